@@ -1,23 +1,81 @@
 # webui-app.py
-import gradio as gr
+import os
 import pandas as pd
-import matplotlib
 from datetime import datetime
-from sqlalchemy import create_engine
-from strategy.Strategy import EnhancedRSIStrategyBacktest
-import os
+from strategy.Cache import TTLCache
+from strategy.Data_Service import MarketDataService
+from strategy.Runner import run_backtest_job, create_executor, BACKTEST_WORKERS, BACKTEST_COMPACT_DATA
+import asyncio
+import threading
 
-# 配置matplotlib非交互模式
-matplotlib.use('Agg')
+# 配置matplotlib非交互模式（通过环境变量设置，无需提前导入 matplotlib，回测子进程同样生效）
+os.environ.setdefault('MPLBACKEND', 'Agg')
 
 DB_PATH = f'sqlite:///db/financial_data.db'
 
 print(f"数据库路径：{DB_PATH}") 
 
+# 回测结果缓存（图表、报告、统计），以及按日期区间缓存的行情切片
+result_cache = TTLCache(maxsize=32, ttl=600)
+data_cache = TTLCache(maxsize=8, ttl=600)
+
+
+_data_service = None
+_data_service_lock = threading.Lock()
+_executor = None
+
+
+def get_data_service():
+    """进程内共享的数据服务，首次调用时预加载策略输入表"""
+    global _data_service
+    with _data_service_lock:
+        if _data_service is None:
+            _data_service = MarketDataService(DB_PATH, compact=BACKTEST_COMPACT_DATA)
+        return _data_service
+
+
+def get_executor():
+    """回测工作池，多个分析员的请求并行执行"""
+    global _executor
+    with _data_service_lock:
+        if _executor is None:
+            _executor = create_executor()
+        return _executor
+
+
+def parse_params(text):
+    """将 "L=50, S=80" 解析为有序元组，空格和顺序不同的相同参数得到同一个键"""
+    params = {}
+    for item in (text or '').replace('，', ',').split(','):
+        if '=' not in item:
+            continue
+        key, value = item.split('=', 1)
+        params[key.strip()] = float(value)
+    return tuple(sorted(params.items()))
+
+
+def load_market_slice(start_date, end_date, version):
+    """读取日期区间内的行情：内存数据集直接二分切片，超出范围的区间查库并缓存"""
+    service = get_data_service()
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    if service.covers(start):
+        return service.query(start, end)
+
+    for (cached_start, cached_end, cached_version), cached in data_cache.items():
+        if cached_version == version and cached_start <= start and end <= cached_end:
+            return cached.loc[start:end]
+
+    df = service.query_sql(start, end)
+    data_cache.set((start, end, version), df)
+    return df
+
 def create_backtest_interface():
+    # gradio 仅在构建界面时导入
+    import gradio as gr
+
     with gr.Blocks(title="量化回测系统", theme=gr.themes.Soft()) as app:
-        # 初始化数据库连接
-        engine = create_engine(DB_PATH)
+        # 启动时预加载行情数据，失败时界面照常启动，在回测请求中报错
+        data_service = get_data_service()
         
         # 头部说明
         gr.Markdown("""
@@ -67,6 +125,7 @@ def create_backtest_interface():
         # 控制按钮
         with gr.Row():
             run_btn = gr.Button("开始回测", variant="primary")
+            cancel_btn = gr.Button("取消回测")
             gr.ClearButton(components=[param_input, capital])
 
         # 结果显示区
@@ -87,54 +146,53 @@ def create_backtest_interface():
                 )
 
         # 回测执行函数
-        def execute_backtest(contract, start_date, end_date, params, capital, commission):
+        async def execute_backtest(contract, start_date, end_date, params, capital, commission):
             try:
-                # 从数据库获取数据
-                query = f"""
-                    SELECT * FROM rsi_strategy_results 
-                    WHERE datetime BETWEEN '{start_date}' AND '{end_date}'
-                """
-                df = pd.read_sql_query(query, engine, 
-                                     index_col='datetime', 
-                                     parse_dates=['datetime'])
-                
-                # 初始化策略
-                strategy = EnhancedRSIStrategyBacktest(
-                    df, 
-                    initial_capital=capital*1e4,
-                    commission=commission/100
-                )
-                results = strategy.run_backtest()
-                
-                # 生成图表
-                strategy.plot_results()
-                figure = matplotlib.pyplot.gcf()
-                
-                # 生成报告
-                report = strategy.get_performance_report()
-                
-                # 数据统计
-                stats = df[['close']].describe()\
-                    .reset_index()\
-                    .rename(columns={'index':'统计指标'})
-                
+                # 数据重载与查库都是阻塞 I/O，放到线程中执行，不阻塞其他用户的请求
+                version = await asyncio.to_thread(data_service.refresh)
+                strategy_params = parse_params(params)
+                cache_key = (contract, start_date, end_date, strategy_params,
+                             float(capital), float(commission), version)
+                cached = result_cache.get(cache_key)
+                if cached is None:
+                    # 从数据库获取数据
+                    df = await asyncio.to_thread(load_market_slice, start_date, end_date, version)
+
+                    # 在工作池中回测，图表使用独立的 Figure 对象
+                    future = get_executor().submit(
+                        run_backtest_job, df, capital*1e4, commission/100, dict(strategy_params)
+                    )
+                    try:
+                        cached = await asyncio.wrap_future(future)
+                    except asyncio.CancelledError:
+                        # 尚未开始执行的任务直接撤销
+                        future.cancel()
+                        raise
+                    result_cache.set(cache_key, cached)
+
+                figure, report, stats = cached
                 return {
                     plot_output: figure,
                     report_output: report,
                     data_stats: stats
                 }
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 raise gr.Error(f"回测失败: {str(e)}")
 
         # 绑定事件
-        run_btn.click(
+        run_event = run_btn.click(
             fn=execute_backtest,
             inputs=[contract, start_date, end_date, param_input, capital, commission],
-            outputs=[plot_output, report_output, data_stats]
+            outputs=[plot_output, report_output, data_stats],
+            concurrency_limit=BACKTEST_WORKERS
         )
+        cancel_btn.click(fn=None, cancels=[run_event])
 
     return app
 
 if __name__ == "__main__":
     web_app = create_backtest_interface()
+    web_app.queue(default_concurrency_limit=BACKTEST_WORKERS)
     web_app.launch(debug = True)
\ No newline at end of file
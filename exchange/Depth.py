@@ -0,0 +1,134 @@
+"""五档盘口快照的紧凑存储，价格按最小变动价位缩放为整数"""
+import re
+import sqlite3
+from datetime import datetime
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+DEPTH_LEVELS = 5
+
+# 每条快照 8 + 4 * 5 * 4 = 88 字节，同等信息用 float64 列存储需要 168 字节以上
+DEPTH_DTYPE = np.dtype([
+    ('ts', 'i8'),                              # 纳秒时间戳
+    ('bid_price', 'i4', (DEPTH_LEVELS,)),      # 价格 / tick_size，无报价为 0
+    ('bid_volume', 'i4', (DEPTH_LEVELS,)),
+    ('ask_price', 'i4', (DEPTH_LEVELS,)),
+    ('ask_volume', 'i4', (DEPTH_LEVELS,)),
+])
+
+
+def _snake_case(name: str) -> str:
+    """BidPrice1 -> bid_price1，兼容 DolphinDB/CSV 原始列名"""
+    return re.sub(r'(?<=[a-z])(?=[A-Z])', '_', name).lower()
+
+
+class DepthStore:
+    """单一合约的五档盘口快照，按时间戳升序存放在结构化数组中"""
+    def __init__(self, snapshots: np.ndarray, tick_size: float = 0.2, symbol: str = None):
+        self.snapshots = snapshots
+        self.tick_size = tick_size
+        self.symbol = symbol
+        self._ts = snapshots['ts']
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    @property
+    def nbytes(self) -> int:
+        return self.snapshots.nbytes
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, tick_size: float = 0.2, symbol: str = None) -> "DepthStore":
+        """由含 datetime 与 bid_price1..5/ask_volume1..5 列的 DataFrame 构建，缺失档位填 0"""
+        df = df.rename(columns=_snake_case)
+        snapshots = np.zeros(len(df), dtype=DEPTH_DTYPE)
+        snapshots['ts'] = pd.to_datetime(df['datetime']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+        for side in ('bid', 'ask'):
+            for level in range(DEPTH_LEVELS):
+                price_col = f'{side}_price{level + 1}'
+                volume_col = f'{side}_volume{level + 1}'
+                if price_col not in df.columns:
+                    continue
+                prices = df[price_col].to_numpy(dtype=np.float64, na_value=0.0)
+                volumes = df[volume_col].to_numpy(dtype=np.float64, na_value=0.0) \
+                    if volume_col in df.columns else np.zeros(len(df))
+                snapshots[f'{side}_price'][:, level] = np.rint(prices / tick_size)
+                snapshots[f'{side}_volume'][:, level] = volumes
+
+        order = np.argsort(snapshots['ts'], kind='stable')
+        return cls(snapshots[order], tick_size, symbol)
+
+    @classmethod
+    def from_sqlite(cls, db_path: str, instrument: str = None, table_name: str = 'market_data',
+                    tick_size: float = 0.2) -> "DepthStore":
+        """读取 market_data（一档）或 futures_market（五档）表，instrument 为空时表中应只有一个合约"""
+        with sqlite3.connect(db_path) as conn:
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+            wanted = ['action_day', 'update_time'] + [
+                c for c in columns if re.fullmatch(r'(bid|ask)_(price|volume)[1-5]', c)
+            ]
+            query = f"SELECT {', '.join(wanted)} FROM {table_name}"
+            params = []
+            if instrument:
+                query += " WHERE instrument_id = ?"
+                params.append(instrument)
+            df = pd.read_sql_query(query, conn, params=params)
+
+        df['datetime'] = pd.to_datetime(df['action_day'].astype(str) + ' ' + df['update_time'].astype(str))
+        return cls.from_frame(df.drop(columns=['action_day', 'update_time']), tick_size, instrument)
+
+    def save(self, path: str):
+        np.save(path, self.snapshots)
+
+    @classmethod
+    def load(cls, path: str, tick_size: float = 0.2, mmap: bool = True, symbol: str = None) -> "DepthStore":
+        """mmap=True 时以内存映射方式打开，回放时按需读页"""
+        return cls(np.load(path, mmap_mode='r' if mmap else None), tick_size, symbol)
+
+    def locate(self, dt: datetime) -> int:
+        """返回不晚于 dt 的最新快照下标，没有则返回 -1"""
+        ts = pd.Timestamp(dt).value
+        return int(np.searchsorted(self._ts, ts, side='right')) - 1
+
+    def book(self, idx: int) -> dict:
+        """还原为浮点价格的盘口，便于查看"""
+        snap = self.snapshots[idx]
+        return {
+            'datetime': pd.Timestamp(int(snap['ts'])),
+            'bid': [(round(int(p) * self.tick_size, 6), int(v)) for p, v in zip(snap['bid_price'], snap['bid_volume'])],
+            'ask': [(round(int(p) * self.tick_size, 6), int(v)) for p, v in zip(snap['ask_price'], snap['ask_volume'])],
+        }
+
+    def walk(self, idx: int, is_buy: bool, limit_price: float, volume: int,
+             used: np.ndarray = None) -> List[Tuple[float, int]]:
+        """按价格优先逐档吃单，返回 [(成交价, 成交量), ...]
+
+        used 为本快照各档已被消耗的数量，由调用方在同一快照内跨订单累计，避免重复占用流动性。
+        """
+        snap = self.snapshots[idx]
+        prices = snap['ask_price'] if is_buy else snap['bid_price']
+        volumes = snap['ask_volume'] if is_buy else snap['bid_volume']
+        limit = int(np.floor(limit_price / self.tick_size + 1e-9)) if is_buy \
+            else int(np.ceil(limit_price / self.tick_size - 1e-9))
+
+        fills = []
+        remaining = volume
+        for level in range(DEPTH_LEVELS):
+            price = int(prices[level])
+            if remaining <= 0 or price <= 0:
+                break
+            if (is_buy and price > limit) or (not is_buy and price < limit):
+                break
+            available = int(volumes[level]) - (int(used[level]) if used is not None else 0)
+            if available <= 0:
+                continue
+            qty = min(remaining, available)
+            if used is not None:
+                used[level] += qty
+            fills.append((round(price * self.tick_size, 6), qty))
+            remaining -= qty
+        return fills
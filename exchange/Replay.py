@@ -0,0 +1,372 @@
+"""行情回放服务 - db/DolphinDB GUI 中 replay/streamTable/subscribeTable 的进程内 asyncio 实现"""
+import argparse
+import asyncio
+import inspect
+import sqlite3
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+TICK_COLUMNS = [
+    'datetime', 'instrument_id', 'last_price', 'high_price', 'low_price', 'open_price',
+    'volume', 'turnover', 'open_interest', 'upper_limit', 'lower_limit',
+    'bid_price1', 'bid_volume1', 'ask_price1', 'ask_volume1'
+]
+
+
+def load_market_data(db_path='db/market_data.db', instrument=None, start=None, end=None,
+                     table_name='market_data'):
+    """从SQLite读取 market_data 并按 action_day + update_time 排序"""
+    clauses, params = [], []
+    if instrument:
+        clauses.append("instrument_id = ?")
+        params.append(instrument)
+    if start:
+        clauses.append("action_day >= ?")
+        params.append(str(start))
+    if end:
+        clauses.append("action_day <= ?")
+        params.append(str(end))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    with sqlite3.connect(db_path) as conn:
+        df = pd.read_sql_query(f"SELECT * FROM {table_name} {where}", conn, params=params)
+
+    df['datetime'] = pd.to_datetime(df['action_day'].astype(str) + ' ' + df['update_time'].astype(str))
+    df = df.sort_values('datetime', kind='stable')
+    return df[[c for c in TICK_COLUMNS if c in df.columns]].reset_index(drop=True)
+
+
+class StreamTable:
+    """内存环形缓冲流表，写满后覆盖最旧记录"""
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self._buffer = [None] * capacity
+        self.seq = 0  # 累计写入条数，同时作为下一条记录的偏移量
+        self.closed = False
+        self._new_data = asyncio.Event()
+
+    def append(self, rows):
+        for row in rows:
+            self._buffer[self.seq % self.capacity] = row
+            self.seq += 1
+        self._notify()
+
+    def read(self, offset, max_rows):
+        """读取 offset 起的记录，返回 (记录, 新偏移量, 被覆盖而丢失的条数)"""
+        dropped = 0
+        oldest = self.seq - self.capacity
+        if offset < oldest:
+            dropped = oldest - offset
+            offset = oldest
+        end = min(self.seq, offset + max_rows)
+        rows = [self._buffer[i % self.capacity] for i in range(offset, end)]
+        return rows, end, dropped
+
+    def close(self):
+        """回放结束，唤醒所有等待中的订阅者"""
+        self.closed = True
+        self._notify()
+
+    async def wait(self, offset):
+        """等待偏移量 offset 之后出现新数据或流表关闭"""
+        while self.seq <= offset and not self.closed:
+            await self._new_data.wait()
+
+    def _notify(self):
+        self._new_data.set()
+        self._new_data = asyncio.Event()
+
+
+class Subscriber:
+    """流表订阅者，维护独立的消费偏移量"""
+    def __init__(self, name, handler, batch_size=1000):
+        self.name = name
+        self.handler = handler
+        self.batch_size = batch_size
+        self.offset = 0
+        self.processed = 0
+        self.dropped = 0
+        self.busy_time = 0.0
+        self._is_async = inspect.iscoroutinefunction(handler) or \
+            inspect.iscoroutinefunction(getattr(handler, '__call__', None))
+
+    def reset(self):
+        """新一轮回放开始时清零偏移量与统计"""
+        self.offset = 0
+        self.processed = 0
+        self.dropped = 0
+        self.busy_time = 0.0
+
+    async def consume(self, table: StreamTable):
+        while True:
+            rows, self.offset, dropped = table.read(self.offset, self.batch_size)
+            self.dropped += dropped
+            if rows:
+                begin = time.perf_counter()
+                if self._is_async:
+                    await self.handler(rows)
+                else:
+                    self.handler(rows)
+                self.busy_time += time.perf_counter() - begin
+                self.processed += len(rows)
+                await asyncio.sleep(0)
+                continue
+            if table.closed:
+                return
+            await table.wait(self.offset)
+
+
+class ReplayEngine:
+    """行情回放引擎
+
+    replay_rate 为 None 或 <= 0 时尽快回放；否则按行情时间戳以 replay_rate 倍速还原墙钟节奏，
+    对应 DolphinDB replay 的 replayRate + absoluteRate=true。
+    """
+    def __init__(self, data: pd.DataFrame, replay_rate=None, capacity=100000,
+                 batch_size=1000, block_when_full=True):
+        if batch_size > capacity:
+            raise ValueError(f"batch_size ({batch_size}) 不能大于流表容量 capacity ({capacity})")
+        self.data = data
+        self.replay_rate = replay_rate
+        self.batch_size = batch_size
+        self.block_when_full = block_when_full
+        self.table: StreamTable = None
+        self.capacity = capacity
+        self.subscribers = {}
+        self._consumers = {}  # 订阅者名称 -> 消费任务
+
+        self.published = 0
+        self.start_wall = None
+        self.end_wall = None
+
+    def subscribe(self, name, handler, batch_size=None):
+        """注册订阅者，handler 接收一批 Tick 记录（namedtuple 列表），可为协程函数"""
+        if name in self.subscribers:
+            raise ValueError(f"订阅者已存在: {name}")
+        subscriber = Subscriber(name, handler, batch_size or self.batch_size)
+        self.subscribers[name] = subscriber
+        if self.table is not None and not self.table.closed:
+            # 回放过程中加入的订阅者从最新位置开始消费（同 DolphinDB subscribeTable 的 offset=-1），
+            # 否则偏移量 0 早已被覆盖，会阻塞发布端
+            subscriber.offset = self.table.seq
+            self._consumers[name] = asyncio.get_running_loop().create_task(subscriber.consume(self.table))
+        return subscriber
+
+    def unsubscribe(self, name):
+        self.subscribers.pop(name, None)
+        task = self._consumers.pop(name, None)
+        if task:
+            task.cancel()
+
+    async def run(self, monitor_interval=None):
+        """启动回放并等待所有订阅者消费完毕，返回统计信息；可重复调用，每次从头回放"""
+        self.table = StreamTable(self.capacity)
+        self.published = 0
+        for sub in self.subscribers.values():
+            sub.reset()
+        self._consumers = {
+            name: asyncio.create_task(sub.consume(self.table))
+            for name, sub in self.subscribers.items()
+        }
+        monitor = asyncio.create_task(self._monitor(monitor_interval)) if monitor_interval else None
+
+        self.start_wall = time.perf_counter()
+        try:
+            await self._publish()
+            self.table.close()
+            await asyncio.gather(*self._consumers.values())
+        finally:
+            self.end_wall = time.perf_counter()
+            if monitor:
+                monitor.cancel()
+            for task in self._consumers.values():
+                task.cancel()
+            self._consumers = {}
+        return self.stats()
+
+    def replay(self, monitor_interval=None):
+        """同步入口"""
+        return asyncio.run(self.run(monitor_interval))
+
+    async def _publish(self):
+        if self.data.empty:
+            return
+        ticks = self.data.itertuples(index=False, name='Tick')
+        if not self.replay_rate or self.replay_rate <= 0:
+            batch = []
+            for tick in ticks:
+                batch.append(tick)
+                if len(batch) >= self.batch_size:
+                    await self._emit(batch)
+                    batch = []
+            if batch:
+                await self._emit(batch)
+            return
+
+        # 按行情时间换算目标墙钟时间，同一时刻到期的记录合并成一批推送
+        seconds = self.data['datetime'].to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+        offsets = (seconds - seconds[0]) / self.replay_rate
+        loop = asyncio.get_running_loop()
+        base = loop.time()
+        batch = []
+        for offset, tick in zip(offsets, ticks):
+            delay = base + offset - loop.time()
+            if delay > 0 and batch:
+                await self._emit(batch)
+                batch = []
+                delay = base + offset - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            batch.append(tick)
+            if len(batch) >= self.batch_size:
+                await self._emit(batch)
+                batch = []
+        if batch:
+            await self._emit(batch)
+
+    async def _emit(self, batch):
+        if self.block_when_full:
+            # 最慢的订阅者落后超过缓冲容量时暂停写入，避免覆盖未消费的数据；
+            # 只统计仍在运行的消费任务，handler 抛出的异常直接向上传递
+            while True:
+                offsets = [self.subscribers[name].offset for name, task in self._consumers.items()
+                           if not self._consumer_done(task)]
+                if not offsets or self.table.seq + len(batch) - min(offsets) <= self.capacity:
+                    break
+                await asyncio.sleep(0.001)
+        self.table.append(batch)
+        self.published += len(batch)
+        await asyncio.sleep(0)
+
+    @staticmethod
+    def _consumer_done(task):
+        if not task.done():
+            return False
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+        return True
+
+    def stats(self):
+        elapsed = ((self.end_wall or time.perf_counter()) - self.start_wall) if self.start_wall else 0.0
+        seq = self.table.seq if self.table else 0
+        return {
+            'published': self.published,
+            'elapsed': elapsed,
+            'ticks_per_sec': self.published / elapsed if elapsed > 0 else 0.0,
+            'subscribers': {
+                name: {
+                    'processed': sub.processed,
+                    'lag': seq - sub.offset,
+                    'dropped': sub.dropped,
+                    'ticks_per_sec': sub.processed / sub.busy_time if sub.busy_time > 0 else 0.0,
+                }
+                for name, sub in self.subscribers.items()
+            }
+        }
+
+    async def _monitor(self, interval):
+        last = 0
+        while True:
+            await asyncio.sleep(interval)
+            stats = self.stats()
+            rate = (stats['published'] - last) / interval
+            last = stats['published']
+            lags = ", ".join(f"{n}: lag={s['lag']} dropped={s['dropped']}" for n, s in stats['subscribers'].items())
+            print(f"[Replay] 已推送 {stats['published']} 条 | {rate:,.0f} ticks/s | {lags}")
+
+
+class SpreadMonitor:
+    """价差与累计成交量监控，对应 DolphinDB 脚本中的 dataHandler + monitorFunc"""
+    def __init__(self, keep_latest=5):
+        self.latest = deque(maxlen=keep_latest)
+        self.total_records = 0
+        self.start_time = None
+        self.end_time = None
+        self.max_price = -np.inf
+        self.min_price = np.inf
+        self.cumulative_volume = 0
+        self._last_volume = {}
+
+    def __call__(self, rows):
+        for tick in rows:
+            # market_data 中的 volume 为当日累计成交量，差分得到逐笔成交量
+            last_volume = self._last_volume.get(tick.instrument_id, 0)
+            tick_volume = tick.volume - last_volume if tick.volume >= last_volume else tick.volume
+            self._last_volume[tick.instrument_id] = tick.volume
+            self.cumulative_volume += tick_volume
+
+            spread = tick.ask_price1 - tick.bid_price1 \
+                if tick.ask_price1 is not None and tick.bid_price1 is not None else np.nan
+            self.latest.append((tick.datetime, tick.instrument_id, tick.last_price, spread, self.cumulative_volume))
+
+            if self.start_time is None:
+                self.start_time = tick.datetime
+            self.end_time = tick.datetime
+            if tick.last_price == tick.last_price:
+                self.max_price = max(self.max_price, tick.last_price)
+                self.min_price = min(self.min_price, tick.last_price)
+        self.total_records += len(rows)
+
+    def summary(self):
+        return {
+            'TotalRecords': self.total_records,
+            'StartTime': self.start_time,
+            'EndTime': self.end_time,
+            'MaxPrice': self.max_price,
+            'MinPrice': self.min_price,
+            'TotalVolume': self.cumulative_volume,
+        }
+
+    def latest_frame(self):
+        return pd.DataFrame(
+            list(self.latest)[::-1],
+            columns=['UpdateTime', 'InstrumentID', 'LastPrice', 'Spread', 'CumulativeVolume']
+        )
+
+
+class TickRecorder:
+    """记录回放收到的全部 Tick"""
+    def __init__(self):
+        self.rows = []
+
+    def __call__(self, rows):
+        self.rows.extend(rows)
+
+    def to_frame(self):
+        return pd.DataFrame(self.rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="market_data 行情回放")
+    parser.add_argument('--db', default='db/market_data.db')
+    parser.add_argument('--instrument', default=None)
+    parser.add_argument('--rate', type=float, default=0, help="回放倍速，0 表示尽快回放")
+    parser.add_argument('--capacity', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=1000, help="每批推送条数，不超过 capacity")
+    parser.add_argument('--monitor-interval', type=float, default=3.0)
+    args = parser.parse_args()
+
+    quotes = load_market_data(args.db, args.instrument)
+    print(f"数据加载成功，记录数：{len(quotes)}")
+
+    engine = ReplayEngine(quotes, replay_rate=args.rate, capacity=args.capacity,
+                          batch_size=min(args.batch_size, args.capacity))
+    spread_monitor = SpreadMonitor()
+    recorder = TickRecorder()
+    engine.subscribe('monitor', spread_monitor)
+    engine.subscribe('recorder', recorder)
+
+    result = engine.replay(monitor_interval=args.monitor_interval)
+
+    print("====== 行情回放统计 ======")
+    print(f"推送 {result['published']} 条，耗时 {result['elapsed']:.3f}s，{result['ticks_per_sec']:,.0f} ticks/s")
+    for name, sub in result['subscribers'].items():
+        print(f"{name}: 处理 {sub['processed']} 条, lag={sub['lag']}, dropped={sub['dropped']}")
+    print("<统计信息>")
+    print(spread_monitor.summary())
+    print("<最新行情>")
+    print(spread_monitor.latest_frame())
@@ -0,0 +1,188 @@
+"""无界面批量回测：命令行与本地 HTTP/JSON 接口，结果以 JSON Lines 流式输出
+
+回测规格示例（JSON 数组或每行一个 JSON 对象）::
+
+    {"id": "q1", "start": "2024-01-02", "end": "2024-04-01",
+     "params": {"L": 50, "S": 80}, "initial_capital": 1e6, "commission": 2e-4}
+
+命令行::
+
+    python -m strategy.Batch specs.jsonl --workers 8 > results.jsonl
+    python -m strategy.Batch --serve --port 8765
+    curl -X POST --data-binary @specs.jsonl http://127.0.0.1:8765/backtests
+"""
+import argparse
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from strategy.Data_Service import MarketDataService
+from strategy.Strategy import EnhancedRSIStrategyBacktest
+
+
+DB_PATH = 'sqlite:///db/financial_data.db'
+
+# 工作进程内共享的数据服务，由 _init_worker 加载一次
+_data_service = None
+
+
+def _init_worker(db_url, table_name, compact):
+    global _data_service
+    # 标准输出留给 JSON Lines 结果
+    with contextlib.redirect_stdout(sys.stderr):
+        _data_service = MarketDataService(db_url, table_name, compact=compact)
+
+
+def _json_value(value):
+    """numpy 标量转为 Python 类型，NaN/inf 输出为 null"""
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def run_spec(spec):
+    """在工作进程中执行单个回测规格，只计算绩效指标，不生成图表与HTML报告"""
+    begin = time.perf_counter()
+    result = {'id': spec.get('id'), 'spec': spec}
+    try:
+        data = _data_service.query(spec['start'], spec['end'])
+        if data.empty:
+            raise ValueError("日期区间内没有数据")
+        strategy = EnhancedRSIStrategyBacktest(
+            data,
+            initial_capital=spec.get('initial_capital', 1e6),
+            commission=spec.get('commission', 2e-4),
+            **spec.get('params', {})
+        )
+        strategy.run_backtest()
+        stats = strategy.get_performance_stats() or {'trade_count': 0}
+        result['metrics'] = {k: _json_value(v) for k, v in stats.items()}
+        result['rows'] = len(data)
+    except Exception as e:
+        result['error'] = str(e)
+    result['elapsed'] = round(time.perf_counter() - begin, 6)
+    return result
+
+
+def create_pool(db_url=DB_PATH, table_name='rsi_strategy_results', workers=None, compact=True):
+    return ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(db_url, table_name, compact)
+    )
+
+
+def run_batch(specs, pool):
+    """提交全部规格，按完成顺序逐个产出结果"""
+    futures = {}
+    for i, spec in enumerate(specs):
+        spec.setdefault('id', i)
+        futures[pool.submit(run_spec, spec)] = spec
+    for future in as_completed(futures):
+        yield future.result()
+
+
+def parse_specs(text):
+    """解析 JSON 数组或 JSON Lines"""
+    text = text.strip()
+    if not text:
+        return []
+    if text.startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def validate_specs(specs):
+    """检查每个规格都是包含 start/end 的 JSON 对象，不合法时抛出 ValueError"""
+    if not isinstance(specs, list):
+        raise ValueError("回测规格应为 JSON 数组或 JSON Lines")
+    for i, spec in enumerate(specs):
+        if not isinstance(spec, dict):
+            raise ValueError(f"第 {i + 1} 个规格不是 JSON 对象")
+        missing = [key for key in ('start', 'end') if key not in spec]
+        if missing:
+            raise ValueError(f"第 {i + 1} 个规格缺少字段: {', '.join(missing)}")
+        if not isinstance(spec.get('params', {}), dict):
+            raise ValueError(f"第 {i + 1} 个规格的 params 不是 JSON 对象")
+    return specs
+
+
+class BatchRequestHandler(BaseHTTPRequestHandler):
+    """POST /backtests 提交回测规格，响应为分块传输的 JSON Lines"""
+    # 分块传输需要 HTTP/1.1
+    protocol_version = 'HTTP/1.1'
+    pool = None
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/backtests':
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            specs = validate_specs(parse_specs(self.rfile.read(length).decode('utf-8')))
+        except (ValueError, UnicodeDecodeError) as e:
+            # 状态行只能使用 latin-1，中文说明放在响应体中
+            self.send_error(400, "Invalid backtest spec", f"无效的回测规格: {e}")
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for result in run_batch(specs, self.pool):
+            line = (json.dumps(result, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+            self.wfile.write(f"{len(line):X}\r\n".encode('ascii') + line + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def serve(pool, host='127.0.0.1', port=8765):
+    BatchRequestHandler.pool = pool
+    server = ThreadingHTTPServer((host, port), BatchRequestHandler)
+    print(f"批量回测服务已启动: http://{host}:{port}/backtests", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="无界面批量回测")
+    parser.add_argument('specs', nargs='?', default='-', help="回测规格文件（JSON 数组或 JSON Lines），- 表示标准输入")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--table', default='rsi_strategy_results')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--full-precision', action='store_true', help="不使用紧凑类型加载策略输入表")
+    parser.add_argument('--serve', action='store_true', help="启动本地 HTTP 服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    batch_specs = None
+    if not args.serve:
+        try:
+            if args.specs == '-':
+                batch_specs = validate_specs(parse_specs(sys.stdin.read()))
+            else:
+                with open(args.specs, encoding='utf-8') as f:
+                    batch_specs = validate_specs(parse_specs(f.read()))
+        except ValueError as e:
+            parser.error(f"无效的回测规格: {e}")
+
+    with create_pool(args.db, args.table, args.workers, not args.full_precision) as executor:
+        if args.serve:
+            serve(executor, args.host, args.port)
+        else:
+            for batch_result in run_batch(batch_specs, executor):
+                print(json.dumps(batch_result, ensure_ascii=False, default=str), flush=True)
@@ -1,7 +1,10 @@
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 from datetime import time, datetime
-from sqlalchemy import create_engine, DateTime, Float, Integer, String, Boolean
+from sqlalchemy import create_engine, text, DateTime, Float, Integer, String, Boolean
 
 
 def debug_print(df, name):
@@ -14,6 +17,17 @@ def debug_print(df, name):
     print(f"NA值统计:\n{df.isna().sum()}")
 
 
+def clean_data(df):
+    """基础数据清洗：成交量0值前向填充，价格缺失前向填充"""
+    return df.assign(
+        volume=df['volume'].replace(0, np.nan).ffill().fillna(0),
+        open=df['open'].ffill(),
+        high=df['high'].ffill(),
+        low=df['low'].ffill(),
+        close=df['close'].ffill()
+    )
+
+
 def load_and_clean(engine, table_name='if_data'):
     """从数据库加载数据并进行清洗"""
     try:
@@ -25,14 +39,7 @@ def load_and_clean(engine, table_name='if_data'):
         df = df.set_index('datetime').sort_index()
 
         # 基础数据清洗
-        df = df.assign(
-            volume=df['volume'].replace(0, np.nan).ffill().fillna(0),
-            open=df['open'].ffill(),
-            high=df['high'].ffill(),
-            low=df['low'].ffill(),
-            close=df['close'].ffill()
-        )
-        return df
+        return clean_data(df)
 
     except Exception as e:
         print(f"数据加载错误: {str(e)}")
@@ -52,11 +59,24 @@ def calculate_rsi(series, window=14):
     return 100 - (100 / (1 + rs))
 
 
-def preprocess_for_rsi_strategy(df):
+def resample_rsi(close, freq, grid_start=None):
+    """按周期取最后价格计算RSI并对齐回原索引
+
+    grid_start 用于分块处理：从该时刻起补齐空周期，使带重叠数据的分块与整段计算结果一致。
+    """
+    bars = close.resample(freq).last()
+    if grid_start is not None:
+        bars = bars.reindex(pd.date_range(grid_start, bars.index[-1], freq=freq))
+    return calculate_rsi(bars).reindex(close.index, method='ffill')
+
+
+def preprocess_for_rsi_strategy(df, grid_start=None):
     """RSI策略专用数据处理"""
+    grid_start = grid_start or {}
+
     # 计算双周期RSI
-    df['rsi_15min'] = calculate_rsi(df['close'].resample('15min').last()).reindex(df.index, method='ffill')
-    df['rsi_5min'] = calculate_rsi(df['close'].resample('5min').last()).reindex(df.index, method='ffill')
+    df['rsi_15min'] = resample_rsi(df['close'], '15min', grid_start.get('15min'))
+    df['rsi_5min'] = resample_rsi(df['close'], '5min', grid_start.get('5min'))
 
     # 隔夜价格变化
     df['prev_close'] = df['close'].shift(1)
@@ -76,6 +96,50 @@ def preprocess_for_rsi_strategy(df):
     return df
 
 
+OUTPUT_COLUMNS = [
+    'symbol', 'open', 'high', 'low', 'close', 'volume',
+    'rsi_15min', 'rsi_5min', 'is_trading_hour',
+    'overnight_change', 'pct_change', 'price_range', 'mid_price'
+]
+
+OUTPUT_DTYPES = {
+    'datetime': DateTime,
+    'symbol': String(20),
+    'open': Float,
+    'high': Float,
+    'low': Float,
+    'close': Float,
+    'volume': Integer,
+    'rsi_15min': Float,
+    'rsi_5min': Float,
+    'is_trading_hour': Boolean,
+    'overnight_change': Float,
+    'pct_change': Float,
+    'price_range': Float,
+    'mid_price': Float
+}
+
+
+def select_output(processed_data):
+    """重置索引并过滤时间，只保留输出字段"""
+    processed_data = processed_data.reset_index()
+    processed_data = processed_data[processed_data['datetime'] <= datetime.now()]
+    return processed_data[['datetime'] + OUTPUT_COLUMNS]
+
+
+def write_processed(processed_data, engine, output_table):
+    """写入数据库"""
+    processed_data = select_output(processed_data)
+    processed_data.to_sql(
+        output_table,
+        con=engine,
+        if_exists='append',
+        index=False,
+        dtype=OUTPUT_DTYPES
+    )
+    return processed_data
+
+
 def process_data(engine, input_table='if_data', output_table='processed_data'):
     """完整数据处理流程"""
     print("开始数据处理...")
@@ -91,41 +155,8 @@ def process_data(engine, input_table='if_data', output_table='processed_data'):
         processed_data = preprocess_for_rsi_strategy(cleaned_data)
         debug_print(processed_data, "计算完成后")
 
-        # 准备写入数据库
-        output_cols = [
-            'symbol', 'open', 'high', 'low', 'close', 'volume',
-            'rsi_15min', 'rsi_5min', 'is_trading_hour',
-            'overnight_change', 'pct_change', 'price_range', 'mid_price'
-        ]
-
-        # 重置索引并过滤时间
-        processed_data = processed_data.reset_index()
-        processed_data = processed_data[processed_data['datetime'] <= datetime.now()]
-        processed_data = processed_data[['datetime'] + output_cols]
-
         # 写入数据库
-        processed_data.to_sql(
-            output_table,
-            con=engine,
-            if_exists='append',
-            index=False,
-            dtype={
-                'datetime': DateTime,
-                'symbol': String(20),
-                'open': Float,
-                'high': Float,
-                'low': Float,
-                'close': Float,
-                'volume': Integer,
-                'rsi_15min': Float,
-                'rsi_5min': Float,
-                'is_trading_hour': Boolean,
-                'overnight_change': Float,
-                'pct_change': Float,
-                'price_range': Float,
-                'mid_price': Float
-            }
-        )
+        processed_data = write_processed(processed_data, engine, output_table)
 
         print(f"\n处理成功！数据已保存到 {output_table}")
         print(f"总处理数据量: {len(processed_data)} 行")
@@ -136,18 +167,139 @@ def process_data(engine, input_table='if_data', output_table='processed_data'):
         return None
 
 
+# 分块处理需要携带的历史窗口：RSI 需要最近 window + 1 个15分钟周期
+OVERLAP_SPAN = pd.Timedelta('15min') * 14
+
+
+def create_datetime_index(engine, table_name='if_data'):
+    """在输入表的 datetime 列上建索引（已存在则跳过），会修改源数据库的表结构"""
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table_name}_datetime ON {table_name} (datetime)"))
+
+
+def iter_trading_days(engine, table_name='if_data'):
+    """按时间顺序逐个交易日读取原始数据，只读，不修改表结构
+
+    每个交易日单独查询，查询结束即释放读锁，处理结果可以边算边写回同一个 SQLite 库。
+    datetime 列没有索引时每天都要全表扫描，可先调用 create_datetime_index。
+    """
+    with engine.connect() as conn:
+        days = [row[0] for row in conn.execute(
+            text(f"SELECT DISTINCT date(datetime) FROM {table_name} ORDER BY 1")
+        ) if row[0] is not None]
+
+    query = text(f"SELECT * FROM {table_name} WHERE datetime >= :start AND datetime < :end ORDER BY datetime")
+    for day in days:
+        next_day = (pd.Timestamp(day) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        with engine.connect() as conn:
+            day_data = pd.read_sql_query(query, conn, params={'start': day, 'end': next_day})
+        day_data['datetime'] = pd.to_datetime(day_data['datetime'])
+        yield day_data
+
+
+def process_partition(overlap, day_data, first_time):
+    """计算一个交易日的特征
+
+    overlap 为前一段已清洗的尾部数据，只用于衔接 RSI 与前收盘价，结果中不包含；
+    first_time 为整段数据的起始时间，保证周期网格与整段计算一致。
+    """
+    if overlap is None or overlap.empty:
+        return preprocess_for_rsi_strategy(day_data.copy())
+
+    window_start = (overlap.index[-1].floor('15min') - OVERLAP_SPAN)
+    grid_start = {
+        freq: max(window_start, first_time.floor(freq)) for freq in ('15min', '5min')
+    }
+    combined = preprocess_for_rsi_strategy(pd.concat([overlap, day_data]), grid_start)
+    return combined.iloc[len(overlap):]
+
+
+def process_data_chunked(engine, input_table='if_data', output_table='processed_data', workers=1,
+                         create_index=False):
+    """分块数据处理流程，按交易日读取、计算和写入，结果与 process_data 一致
+
+    每个交易日只需携带上一段的清洗尾部数据（RSI 回看窗口与前收盘价），
+    workers > 1 时各交易日在进程池中并行计算，峰值内存约为 workers * 2 个交易日的数据量。
+    默认不修改输入表，datetime 列没有索引时逐日查询为全表扫描；create_index=True 时先在输入表上
+    创建 datetime 索引（ix_<input_table>_datetime），这是对源数据库的结构修改。
+    """
+    print("开始分块数据处理...")
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    pending = deque()
+    overlap = None
+    first_time = None
+    total_rows = 0
+
+    def flush(limit):
+        nonlocal total_rows
+        while len(pending) > limit:
+            result = pending.popleft()
+            processed = result.result() if executor else result
+            total_rows += len(write_processed(processed, engine, output_table))
+
+    try:
+        if create_index:
+            create_datetime_index(engine, input_table)
+        for raw_day in iter_trading_days(engine, input_table):
+            day_data = raw_day.set_index('datetime').sort_index()
+            if first_time is None:
+                first_time = day_data.index[0]
+
+            # 以上一段最后一行作为前向填充的起点，清洗结果与整段清洗一致
+            if overlap is not None:
+                day_data = clean_data(pd.concat([overlap.iloc[-1:], day_data])).iloc[1:]
+            else:
+                day_data = clean_data(day_data)
+
+            if executor:
+                pending.append(executor.submit(process_partition, overlap, day_data, first_time))
+            else:
+                pending.append(process_partition(overlap, day_data, first_time))
+            flush(workers * 2)
+
+            tail = day_data if overlap is None else pd.concat([overlap, day_data])
+            overlap = tail[tail.index >= tail.index[-1].floor('15min') - OVERLAP_SPAN]
+
+        flush(0)
+        print(f"\n处理成功！数据已保存到 {output_table}")
+        print(f"总处理数据量: {total_rows} 行")
+        return total_rows
+
+    except Exception as e:
+        print(f"\n处理失败: {str(e)}")
+        return None
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RSI策略数据处理")
+    parser.add_argument('--chunked', action='store_true', help="按交易日分块处理，适用于超出内存的数据")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--create-index', action='store_true', help="分块处理前在输入表上创建 datetime 索引（修改源库表结构）")
+    args = parser.parse_args()
+
     db_engine = create_engine('sqlite:///db/financial_data.db')
     
     # 运行处理流程
-    result = process_data(
-        engine=db_engine,
-        input_table='if_data',
-        output_table='rsi_strategy_results'
-    )
+    if args.chunked:
+        result = process_data_chunked(
+            engine=db_engine,
+            input_table='if_data',
+            output_table='rsi_strategy_results',
+            workers=args.workers,
+            create_index=args.create_index
+        )
+    else:
+        result = process_data(
+            engine=db_engine,
+            input_table='if_data',
+            output_table='rsi_strategy_results'
+        )
 
     if result is None:
         print("\n调试建议:")
         print("1. 检查数据库连接参数")
         print("2. 确认输入表存在且包含必要字段")
-        print("3. 验证目标表结构是否匹配输出字段")
\ No newline at end of file
+        print("3. 验证目标表结构是否匹配输出字段")
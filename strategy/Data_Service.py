@@ -0,0 +1,145 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+
+# SQLAlchemy DateTime 在 SQLite 中的存储格式
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# 紧凑模式下的列类型：开高低收参与收益计算，RSI 在最小变动价位下经常落在阈值附近
+# （如 19.9999999），二者都保持 float64；其余特征只用于展示，降为 float32
+COMPACT_DTYPES = {
+    'volume': 'int32',
+    'overnight_change': 'float32',
+    'pct_change': 'float32',
+    'price_range': 'float32',
+    'mid_price': 'float32',
+}
+
+
+class MarketDataService:
+    """策略输入数据服务
+
+    启动时将 rsi_strategy_results 一次性读入内存（按时间排序的索引），日期区间请求通过
+    二分查找直接切片；超出内存范围的请求走参数绑定的 SQL 查询。
+
+    compact=True 时按 COMPACT_DTYPES 降低非信号列精度，回测结果与完整精度一致。
+    """
+    def __init__(self, db_url, table_name='rsi_strategy_results', max_rows=None, preload=True,
+                 compact=False):
+        connect_args = {'check_same_thread': False} if db_url.startswith('sqlite') else {}
+        self.engine = create_engine(db_url, pool_pre_ping=True, connect_args=connect_args)
+        self.table_name = table_name
+        self.max_rows = max_rows
+        self.compact = compact
+        self.frame = None
+        self.covered_from = None  # 内存数据覆盖的最早时间，None 表示完整加载
+        self.version = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        if preload:
+            try:
+                self.load()
+            except Exception as e:
+                # 预加载失败不影响启动，请求时走 SQL 查询并在请求中报错
+                print(f"预加载 {self.table_name} 失败: {e}")
+
+    def load(self):
+        """读取整表（或最近 max_rows 行）到内存"""
+        self._check_database()
+        version = self._file_version()
+        if self.max_rows:
+            query = text(f"SELECT * FROM (SELECT * FROM {self.table_name} "
+                         f"ORDER BY datetime DESC LIMIT :n) ORDER BY datetime")
+            params = {'n': int(self.max_rows)}
+        else:
+            query = text(f"SELECT * FROM {self.table_name} ORDER BY datetime")
+            params = {}
+
+        with self.engine.connect() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        df = self._compact(df, self.compact)
+
+        with self._lock:
+            self.frame = df
+            self._index = df.index.values
+            truncated = self.max_rows and len(df) >= self.max_rows
+            self.covered_from = df.index[0] if truncated and len(df) else None
+            self.version = version
+        print(f"已加载 {self.table_name}: {len(df)} 行, {df.memory_usage(deep=True).sum() / 2**20:.1f} MB")
+        return df
+
+    def refresh(self):
+        """数据库文件变化后重新加载，返回当前数据版本
+
+        整表重载耗时较长，异步调用方应放到线程中执行；并发请求只有一个执行重载，其余等待后复用结果。
+        """
+        if self._file_version() != self.version:
+            with self._reload_lock:
+                if self._file_version() != self.version:
+                    self.load()
+        return self.version
+
+    def covers(self, start):
+        if self.frame is None:
+            return False
+        return self.covered_from is None or pd.Timestamp(start) >= self.covered_from
+
+    def query(self, start, end):
+        """返回 [start, end] 区间的行情，两端均包含"""
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if not self.covers(start):
+            return self.query_sql(start, end)
+        with self._lock:
+            frame, index = self.frame, self._index
+        lo = np.searchsorted(index, start.to_datetime64(), side='left')
+        hi = np.searchsorted(index, end.to_datetime64(), side='right')
+        return frame.iloc[lo:hi]
+
+    def query_sql(self, start, end):
+        self._check_database()
+        query = text(f"SELECT * FROM {self.table_name} "
+                     f"WHERE datetime BETWEEN :start AND :end ORDER BY datetime")
+        # 与 SQLAlchemy DateTime 在 SQLite 中的存储格式一致，保证字符串比较的边界正确
+        params = {
+            'start': pd.Timestamp(start).strftime(SQLITE_DATETIME_FORMAT),
+            'end': pd.Timestamp(end).strftime(SQLITE_DATETIME_FORMAT),
+        }
+        with self.engine.connect() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        return self._compact(df, self.compact)
+
+    @staticmethod
+    def _compact(df, compact=False):
+        # 时间索引为 datetime64[ns]，底层即 int64 纳秒时间戳
+        df['datetime'] = pd.to_datetime(df['datetime'], format=SQLITE_DATETIME_FORMAT)
+        if 'symbol' in df.columns:
+            df['symbol'] = df['symbol'].astype('category')
+        if 'is_trading_hour' in df.columns:
+            df['is_trading_hour'] = df['is_trading_hour'].astype(bool)
+        if compact:
+            for column, dtype in COMPACT_DTYPES.items():
+                if column not in df.columns:
+                    continue
+                # 含空值的整数列无法转为 int32，退回 float32
+                if dtype.startswith('int') and df[column].isna().any():
+                    dtype = 'float32'
+                df[column] = df[column].astype(dtype)
+        return df.set_index('datetime').sort_index(kind='stable')
+
+    def _check_database(self):
+        """SQLite 文件不存在时直接报错，避免连接时创建空数据库文件"""
+        path = self.engine.url.database
+        if self.engine.url.get_backend_name() == 'sqlite' and path and path != ':memory:' \
+                and not os.path.exists(path):
+            raise FileNotFoundError(f"数据库文件不存在: {path}")
+
+    def _file_version(self):
+        path = self.engine.url.database
+        if not path or not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
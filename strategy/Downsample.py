@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+
+def _endpoints(n, n_out):
+    """点数预算不足以分桶时只保留首尾端点"""
+    return np.array([0, n - 1]) if n_out >= 2 else np.array([n - 1])
+
+
+def minmax_indices(y, n_out):
+    """分桶保留每桶的最高点与最低点，峰值和回撤底部不会被抹掉；首尾端点计入 n_out"""
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    n_buckets = (n_out - 2) // 2
+    if n_buckets < 1:
+        return _endpoints(n, n_out)
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    idx = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end <= start:
+            continue
+        bucket = y[start:end]
+        idx.append(start + np.argmin(bucket))
+        idx.append(start + np.argmax(bucket))
+    idx.append(0)
+    idx.append(n - 1)
+    return np.unique(idx)
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets 降采样，保留曲线形状"""
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    if n_out < 3:
+        return _endpoints(n, n_out)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[edges[i + 1]:edges[i + 2]].mean()
+            next_y = y[edges[i + 1]:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) -
+                      (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(np.argmax(area)) if end > start else start
+        idx[i + 1] = a
+    idx[-1] = n - 1
+    return idx
+
+
+def downsample(series, max_points, method='minmax'):
+    """按 method ('minmax' 或 'lttb') 将时间序列抽样到不超过 max_points 个点，NaN 先剔除"""
+    series = series.dropna()
+    if max_points is None or len(series) <= max_points:
+        return series
+    y = series.to_numpy(dtype=np.float64)
+    if method == 'lttb':
+        x = series.index.asi8.astype(np.float64) if isinstance(series.index, pd.DatetimeIndex) \
+            else np.arange(len(series), dtype=np.float64)
+        idx = lttb_indices(x, y, max_points)
+    elif method == 'minmax':
+        idx = minmax_indices(y, max_points)
+    else:
+        raise ValueError(f"未知的降采样方法: {method}")
+    return series.iloc[idx]
@@ -0,0 +1,268 @@
+"""事件驱动版增强型RSI策略，通过 EVENT_TICK/EVENT_ORDER/EVENT_TRADE 与 exchange/Exchange 中的 BacktestExchange 交互"""
+import bisect
+import itertools
+import time as clock
+from collections import deque
+from datetime import time, timedelta
+
+import numpy as np
+import pandas as pd
+
+from core.event import Event, EventEngine, EVENT_TICK, EVENT_ORDER, EVENT_TRADE, EVENT_REQUEST
+from datastructure.object import TickData, OrderData, TradeData, OrderRequest, CancelRequest
+from datastructure.constant import Direction, Offset, Status
+
+
+class LatencyHistogram:
+    """对数分桶的延迟直方图，单位纳秒，每个数量级 4 个桶"""
+    def __init__(self, name, max_exponent=12):
+        self.name = name
+        self.bounds = [10 ** (e / 4) for e in range(4 * max_exponent + 1)]
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value_ns):
+        self.counts[bisect.bisect_left(self.bounds, value_ns)] += 1
+        self.count += 1
+        self.total += value_ns
+        self.max = max(self.max, value_ns)
+
+    def percentile(self, q):
+        """返回第 q 百分位所在桶的上界"""
+        if self.count == 0:
+            return np.nan
+        target = q / 100 * self.count
+        cumulative = 0
+        for i, c in enumerate(self.counts):
+            cumulative += c
+            if cumulative >= target:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            'name': self.name,
+            'count': self.count,
+            'mean_us': self.total / self.count / 1e3 if self.count else np.nan,
+            'p50_us': self.percentile(50) / 1e3,
+            'p90_us': self.percentile(90) / 1e3,
+            'p99_us': self.percentile(99) / 1e3,
+            'max_us': self.max / 1e3,
+        }
+
+
+class IncrementalRSI:
+    """按固定周期聚合 Tick 并增量计算 RSI
+
+    与 Data_Process.calculate_rsi 口径一致：取每个周期最后一笔价格，涨跌幅做 window 期简单平均，
+    空周期计为 0。区别在于只使用已走完的周期，不会像 resample + ffill 那样提前用到本周期的收盘价。
+    """
+    def __init__(self, freq, window=14):
+        self.freq = pd.Timedelta(freq)
+        self.window = window
+        self.gains = deque(maxlen=window)
+        self.losses = deque(maxlen=window)
+        self.bar_start = None
+        self.bar_close = None
+        self.prev_close = None
+        self.value = np.nan
+
+    def update(self, dt, price):
+        """输入一笔成交价，周期切换时更新 RSI 并返回 True"""
+        bar_start = pd.Timestamp(dt).floor(self.freq)
+        if self.bar_start is None:
+            self.bar_start, self.bar_close = bar_start, price
+            return False
+        if bar_start == self.bar_start:
+            self.bar_close = price
+            return False
+
+        self._close_bar(self.bar_close)
+        empty_bars = int((bar_start - self.bar_start) / self.freq) - 1
+        for _ in range(min(empty_bars, self.window)):
+            self._push(0.0, 0.0)
+            self.prev_close = None
+        self.bar_start, self.bar_close = bar_start, price
+        return True
+
+    def _close_bar(self, close):
+        delta = close - self.prev_close if self.prev_close is not None else 0.0
+        self._push(max(delta, 0.0), max(-delta, 0.0))
+        self.prev_close = close
+
+    def _push(self, gain, loss):
+        self.gains.append(gain)
+        self.losses.append(loss)
+        if len(self.gains) == self.window:
+            rs = (sum(self.gains) / self.window) / (sum(self.losses) / self.window + 1e-10)
+            self.value = 100 - (100 / (1 + rs))
+
+
+_strategy_ids = itertools.count(1)
+
+
+class EventRSIStrategy:
+    """增强型RSI策略的事件驱动适配器
+
+    订阅 EVENT_TICK 增量维护 5 分钟/15 分钟 RSI，满足条件时通过 EVENT_REQUEST 发送 OrderRequest，
+    并在 EVENT_TRADE 中更新持仓。同时记录 tick→下单、下单→成交 的延迟分布。
+
+    委托以对手价挂出，行情离开后可能不再成交：超过 order_timeout 秒（行情时间）仍未完全成交的委托
+    会被撤销，平仓条件仍满足时按新的对手价重新下单。尾盘平仓与止损检查不受未完成委托影响。
+    """
+    def __init__(self, event_engine: EventEngine, symbol, exchange, L=50, S=80, volume=1,
+                 stop_return=0.02, order_timeout=3.0):
+        self.engine = event_engine
+        self.symbol = symbol
+        self.exchange = exchange
+        self.L, self.S = L, S
+        self.volume = volume
+        self.stop_return = stop_return
+        self.order_timeout = timedelta(seconds=order_timeout)
+
+        self.rsi_5min = IncrementalRSI('5min')
+        self.rsi_15min = IncrementalRSI('15min')
+        self.position = 0
+        self.entry_price = None
+        self.trades = []
+
+        # 请求的 reference 由交易所复制到委托上，用于认领委托号；同一引擎上的多个策略互不干扰
+        self.reference = f"{type(self).__name__}.{next(_strategy_ids)}"
+        self._request_ids = itertools.count(1)
+        # reference -> 已发出、交易所尚未回报委托号的请求
+        self._unacked = {}
+        # 委托号 -> 未完成委托，只处理这些委托号的回报与成交
+        self._working = {}
+
+        self.tick_to_order = LatencyHistogram('tick_to_order')
+        self.order_to_fill = LatencyHistogram('order_to_fill')
+        self.order_to_fill_market = LatencyHistogram('order_to_fill_market')
+
+        self.engine.register(EVENT_TICK, self._on_tick_event)
+        self.engine.register(EVENT_ORDER, self._on_order_event)
+        self.engine.register(EVENT_TRADE, self._on_trade_event)
+
+    def _on_tick_event(self, event: Event):
+        received = clock.perf_counter_ns()
+        tick: TickData = event.data
+        if tick.symbol != self.symbol:
+            return
+
+        self.rsi_5min.update(tick.datetime, tick.last_price)
+        self.rsi_15min.update(tick.datetime, tick.last_price)
+        self._cancel_stale_orders(tick.datetime)
+
+        tick_time = tick.datetime.time()
+        if self.position != 0:
+            self._check_exit(tick, tick_time, received)
+            return
+        if self._unacked or self._working:
+            return
+
+        if not time(10, 0) <= tick_time < time(15, 0):
+            return
+        L, S = self.L, self.S
+        if self.rsi_15min.value > L and self.rsi_5min.value > S:
+            self._send_order(tick, 1, Offset.OPEN, self.volume, received)
+        elif self.rsi_15min.value < (100 - L) and self.rsi_5min.value < (100 - S):
+            self._send_order(tick, -1, Offset.OPEN, self.volume, received)
+
+    def _check_exit(self, tick: TickData, tick_time, received):
+        """尾盘或止盈止损时撤销未成交的开仓委托，并对当前持仓发出平仓委托"""
+        current_return = (tick.last_price - self.entry_price) / self.entry_price * np.sign(self.position)
+        if tick_time < time(14, 45) and abs(current_return) < self.stop_return:
+            return
+
+        records = list(self._unacked.values()) + list(self._working.values())
+        for record in records:
+            if record['request'].offset == Offset.OPEN:
+                self._cancel_order(record)
+        if not any(record['request'].offset == Offset.CLOSE for record in records):
+            self._send_order(tick, -np.sign(self.position), Offset.CLOSE, abs(self.position), received)
+
+    def _cancel_stale_orders(self, now):
+        for record in list(self._working.values()):
+            if now - record['tick_time'] >= self.order_timeout:
+                self._cancel_order(record)
+
+    def _cancel_order(self, record):
+        # 尚未拿到委托号的请求在回报后的下一笔行情再撤
+        if record['orderid'] is None or record['cancelling']:
+            return
+        record['cancelling'] = True
+        request = CancelRequest(orderid=record['orderid'], symbol=self.symbol, exchange=self.exchange)
+        self.engine.put(Event(EVENT_REQUEST, request))
+
+    def _send_order(self, tick: TickData, direction, offset, volume, received):
+        # 以对手价下单，保证可立即成交
+        reference = f"{self.reference}.{next(self._request_ids)}"
+        if direction > 0:
+            request = OrderRequest(symbol=self.symbol, exchange=self.exchange, direction=Direction.LONG,
+                                   offset=offset, order_price=tick.ask_price_1, order_volume=volume,
+                                   reference=reference)
+        else:
+            request = OrderRequest(symbol=self.symbol, exchange=self.exchange, direction=Direction.SHORT,
+                                   offset=offset, order_price=tick.bid_price_1, order_volume=volume,
+                                   reference=reference)
+        sent = clock.perf_counter_ns()
+        self._unacked[reference] = {
+            'request': request,
+            'orderid': None,
+            'sent': sent,
+            'tick_time': tick.datetime,
+            'remaining': volume,
+            'filled': False,
+            'cancelling': False,
+        }
+        self.engine.put(Event(EVENT_REQUEST, request))
+        self.tick_to_order.record(sent - received)
+
+    def _on_order_event(self, event: Event):
+        order: OrderData = event.data
+        if order.symbol != self.symbol:
+            return
+
+        # 首次回报时按 reference 认领委托号，认领不到说明不是本策略的委托
+        record = self._unacked.pop(order.reference, None)
+        if record is not None:
+            record['orderid'] = order.orderid
+            self._working[order.orderid] = record
+        if order.status == Status.CANCELLED:
+            self._working.pop(order.orderid, None)
+
+    def _on_trade_event(self, event: Event):
+        now = clock.perf_counter_ns()
+        trade: TradeData = event.data
+        record = self._working.get(trade.orderid)
+        if trade.symbol != self.symbol or record is None:
+            return
+
+        if not record['filled']:
+            self.order_to_fill.record(now - record['sent'])
+            self.order_to_fill_market.record((trade.datetime - record['tick_time']).total_seconds() * 1e9)
+            record['filled'] = True
+        record['remaining'] -= trade.fill_volume
+        if record['remaining'] <= 0:
+            self._working.pop(trade.orderid, None)
+
+        delta = trade.fill_volume if trade.direction == Direction.LONG else -trade.fill_volume
+        if self.position == 0:
+            self.entry_price = trade.fill_price
+        self.position += delta
+        if self.position == 0:
+            self.entry_price = None
+        self.trades.append({
+            'datetime': trade.datetime,
+            'direction': trade.direction,
+            'offset': trade.offset,
+            'price': trade.fill_price,
+            'volume': trade.fill_volume,
+        })
+
+    def latency_report(self) -> pd.DataFrame:
+        """各延迟直方图的统计摘要，单位微秒"""
+        return pd.DataFrame([
+            h.summary() for h in (self.tick_to_order, self.order_to_fill, self.order_to_fill_market)
+        ]).set_index('name')
@@ -0,0 +1,45 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from strategy.Strategy import EnhancedRSIStrategyBacktest
+
+
+# 执行器类型与并发数可通过环境变量配置
+BACKTEST_EXECUTOR = os.environ.get('BACKTEST_EXECUTOR', 'process')
+BACKTEST_WORKERS = int(os.environ.get('BACKTEST_WORKERS', min(4, os.cpu_count() or 1)))
+# 策略输入表是否以紧凑类型加载（见 Data_Service.COMPACT_DTYPES），设为 0 时保留原始精度
+BACKTEST_COMPACT_DATA = os.environ.get('BACKTEST_COMPACT_DATA', '1') != '0'
+
+# Web 图表每条曲线的最大点数
+PLOT_MAX_POINTS = 2000
+
+
+def run_backtest_job(data, initial_capital, commission, params=None):
+    """单次回测：运行策略并生成图表、报告和行情统计，全部使用本次请求独立的对象"""
+    strategy = EnhancedRSIStrategyBacktest(
+        data,
+        initial_capital=initial_capital,
+        commission=commission,
+        **(params or {})
+    )
+    strategy.run_backtest()
+
+    figure = strategy.plot_results(max_points=PLOT_MAX_POINTS)
+    report = strategy.get_performance_report()
+    stats = data[['close']].describe()\
+        .reset_index()\
+        .rename(columns={'index': '统计指标'})
+    return figure, report, stats
+
+
+def create_executor(kind=None, max_workers=None):
+    """创建回测工作池，kind 为 'process' 或 'thread'"""
+    kind = kind or BACKTEST_EXECUTOR
+    max_workers = max_workers or BACKTEST_WORKERS
+    if kind == 'thread':
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='backtest')
+    if kind == 'process':
+        # Web 服务已启动多个线程，使用 spawn 避免 fork 复制锁状态
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+    raise ValueError(f"未知的执行器类型: {kind}")
@@ -1,31 +1,46 @@
 #交易时间为10：00-14：45
+import threading
 import pandas as pd
 import numpy as np
 from datetime import time
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import seaborn as sns
-from sqlalchemy import create_engine, DateTime, Float, Integer, String, Boolean
+from strategy.Downsample import downsample
+
+# matplotlib/seaborn 只在首次绘图时导入，回测工作进程和批量任务不承担这部分启动开销
+_plot_style_lock = threading.Lock()
+_plot_style_applied = False
+
+
+def _setup_plotting():
+    """导入绘图依赖并设置全局样式（仅一次）"""
+    global _plot_style_applied
+    with _plot_style_lock:
+        if not _plot_style_applied:
+            import matplotlib.style
+            import seaborn as sns
+            matplotlib.style.use('tableau-colorblind10')
+            sns.set_palette("deep")
+            _plot_style_applied = True
 
-plt.style.use('tableau-colorblind10')
-sns.set_palette("deep")
 
 class EnhancedRSIStrategyBacktest:
-    def __init__(self, data, initial_capital=1e6, commission=2e-4):
+    def __init__(self, data, initial_capital=1e6, commission=2e-4, L=50, S=80):
         self.data = data
+        self.L, self.S = L, S
         self.initial_capital = initial_capital
         self.commission_rate = commission
         self.trades = []
         self.current_position = 0
         self.entry_price = None
         self.dates = data.index
-        self.open_prices = data['open'].values
-        self.close_prices = data['close'].values
-        self.is_trading_hour = data['is_trading_hour'].values
+        # 价格列已是 float64 时直接引用原数组，不复制输入数据
+        self.open_prices = data['open'].to_numpy(dtype=np.float64)
+        self.close_prices = data['close'].to_numpy(dtype=np.float64)
+        self.is_trading_hour = data['is_trading_hour'].to_numpy(dtype=bool)
         self.equity = np.zeros(len(data))
         self.equity[0] = initial_capital
         self.commissions = np.zeros(len(data))
-        self.eod_condition = np.array([(dt.time() >= time(14, 45)) for dt in self.dates], dtype=bool)
+        eod = time(14, 45)
+        self.eod_condition = (self.dates.hour * 60 + self.dates.minute).to_numpy() >= eod.hour * 60 + eod.minute
 
     def check_database_connection(self):
         """检查数据库连接有效性"""
@@ -37,18 +52,33 @@ class EnhancedRSIStrategyBacktest:
             return False
         
     def generate_signals(self):
-        df = self.data.copy()
-        L, S = 50, 80
-
-        df['long_signal'] = ((df['rsi_15min'].shift(1) > L) &
-                            (df['rsi_5min'].shift(1) > S) &
-                            self.is_trading_hour)
-        df['short_signal'] = ((df['rsi_15min'].shift(1) < (100 - L)) &
-                             (df['rsi_5min'].shift(1) < (100 - S)) &
-                             self.is_trading_hour)
-        df['signal'] = np.where(df['long_signal'], 1, np.where(df['short_signal'], -1, 0))
-        self.signals = df['signal'].values
-        return df
+        """在 RSI 列的数组上计算信号，结果表只保留收盘价与信号列，不复制整张输入表"""
+        L, S = self.L, self.S
+        rsi_15min = self._shifted(self.data['rsi_15min'])
+        rsi_5min = self._shifted(self.data['rsi_5min'])
+
+        long_signal = (rsi_15min > L) & (rsi_5min > S) & self.is_trading_hour
+        short_signal = (rsi_15min < (100 - L)) & (rsi_5min < (100 - S)) & self.is_trading_hour
+        self.signals = np.where(long_signal, 1, np.where(short_signal, -1, 0))
+        return pd.DataFrame({
+            'close': self.close_prices,
+            'signal': self.signals,
+        }, index=self.dates)
+
+    @staticmethod
+    def _shifted(column):
+        """等价于 shift(1)，保留列本身的浮点精度
+
+        RSI 列在紧凑模式下同样是 float64（见 Data_Service.COMPACT_DTYPES），降为 float32 会使
+        落在阈值附近的值被舍入到阈值上，改变信号。
+        """
+        values = column.to_numpy()
+        if not np.issubdtype(values.dtype, np.floating):
+            values = values.astype(np.float64)
+        shifted = np.empty_like(values)
+        shifted[:1] = np.nan
+        shifted[1:] = values[:-1]
+        return shifted
 
     def run_backtest(self):
         df = self.generate_signals()
@@ -124,52 +154,83 @@ class EnhancedRSIStrategyBacktest:
         position_return = close_pct_change[idx] * self.current_position
         self.equity[idx] = self.equity[idx-1] * (1 + position_return) - self.commissions[idx]
 
-    def plot_results(self):
-        """可视化"""
-        plt.figure(figsize=(16, 12))
+    def plot_results(self, fig=None, max_points=None):
+        """可视化，在独立的 Figure 上绘图，不依赖 pyplot 全局状态
+
+        max_points 不为空时启用分级细节模式：每条曲线降采样到 max_points 个点以内，
+        价格图只标记交易记录中的实际开平仓点，绘图耗时不随回测区间增长。
+        """
+        _setup_plotting()
+        import matplotlib.dates as mdates
+        from matplotlib.figure import Figure
+
+        if fig is None:
+            fig = Figure(figsize=(16, 12))
 
         # 价格与信号图
-        ax1 = plt.subplot(3, 1, 1)
-        plt.plot(self.results['close'], label='Price', alpha=0.7)
-
-        # 标记交易信号
-        long_signals = self.results[self.results['signal'] == 1]
-        short_signals = self.results[self.results['signal'] == -1]
-        plt.scatter(long_signals.index, long_signals['close'], marker='^',
-                   color='g', s=100, label='Long Signal')
-        plt.scatter(short_signals.index, short_signals['close'], marker='v',
-                   color='r', s=100, label='Short Signal')
-        plt.title('Price with Trading Signals')
-        plt.legend()
+        ax1 = fig.add_subplot(3, 1, 1)
+        ax1.plot(downsample(self.results['close'], max_points), label='Price', alpha=0.7)
+
+        if max_points is None:
+            # 标记交易信号
+            long_signals = self.results[self.results['signal'] == 1]
+            short_signals = self.results[self.results['signal'] == -1]
+            ax1.scatter(long_signals.index, long_signals['close'], marker='^',
+                       color='g', s=100, label='Long Signal')
+            ax1.scatter(short_signals.index, short_signals['close'], marker='v',
+                       color='r', s=100, label='Short Signal')
+        else:
+            self._plot_trades(ax1, max_points)
+        ax1.set_title('Price with Trading Signals')
+        ax1.legend()
 
         # 收益曲线图
-        ax2 = plt.subplot(3, 1, 2, sharex=ax1)
-        plt.plot(self.results['cum_returns'], label='Strategy', color='b')
-        plt.plot((self.results['close']/self.results['close'].iloc[0]),
+        ax2 = fig.add_subplot(3, 1, 2, sharex=ax1)
+        ax2.plot(downsample(self.results['cum_returns'], max_points, 'lttb'), label='Strategy', color='b')
+        ax2.plot(downsample(self.results['close']/self.results['close'].iloc[0], max_points, 'lttb'),
                 label='Buy & Hold', alpha=0.5)
-        plt.title('Cumulative Returns')
-        plt.legend()
+        ax2.set_title('Cumulative Returns')
+        ax2.legend()
 
         # 回撤曲线图
-        ax3 = plt.subplot(3, 1, 3, sharex=ax1)
+        ax3 = fig.add_subplot(3, 1, 3, sharex=ax1)
         max_returns = self.results['cum_returns'].cummax()
-        drawdown = (self.results['cum_returns'] - max_returns)/max_returns
-        plt.fill_between(drawdown.index, drawdown*100, 0,
+        drawdown = downsample((self.results['cum_returns'] - max_returns)/max_returns, max_points)
+        ax3.fill_between(drawdown.index, drawdown*100, 0,
                         color='red', alpha=0.3)
-        plt.title('Drawdown (%)')
+        ax3.set_title('Drawdown (%)')
 
         # 格式调整
         for ax in [ax1, ax2, ax3]:
             ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
             ax.grid(True, alpha=0.3)
-        plt.tight_layout()
+        fig.tight_layout()
+        return fig
 
-    def get_performance_report(self):
-        """生成报告"""
+    def _plot_trades(self, ax, max_points):
+        """标记交易记录中的开仓与平仓点，数量超过 max_points 时均匀抽取"""
+        trades = pd.DataFrame(self.trades)
+        if trades.empty:
+            return
+        if len(trades) > max_points:
+            trades = trades.iloc[np.linspace(0, len(trades) - 1, max_points).astype(int)]
+
+        long_entries = trades[trades['direction'] == 1]
+        short_entries = trades[trades['direction'] == -1]
+        exits = trades.dropna(subset=['exit_datetime'])
+        ax.scatter(long_entries['datetime'], long_entries['entry_price'], marker='^',
+                   color='g', s=60, label='Long Entry')
+        ax.scatter(short_entries['datetime'], short_entries['entry_price'], marker='v',
+                   color='r', s=60, label='Short Entry')
+        ax.scatter(pd.to_datetime(exits['exit_datetime']), exits['exit_price'].astype(float), marker='x',
+                   color='k', s=40, label='Exit')
+
+    def get_performance_stats(self):
+        """绩效指标字典，无交易时返回 None"""
         trades_df = pd.DataFrame(self.trades)
 
         if trades_df.empty:
-            return "No trades executed"
+            return None
 
         # 基础指标
         total_return = self.results['cum_returns'].iloc[-1] - 1
@@ -186,6 +247,37 @@ class EnhancedRSIStrategyBacktest:
         profit_factor = (trades_df[trades_df['returns'] > 0]['returns'].sum() /
                         abs(trades_df[trades_df['returns'] < 0]['returns'].sum()))
 
+        return {
+            'annualized_return': annualized_return,
+            'total_return': total_return,
+            'max_drawdown': max_drawdown,
+            'win_rate': win_rate,
+            'avg_win': avg_win,
+            'avg_loss': avg_loss,
+            'profit_factor': profit_factor,
+            'trade_count': len(trades_df),
+            'long_ratio': trades_df[trades_df['direction']==1].shape[0]/len(trades_df),
+            'avg_duration': trades_df['duration'].mean(),
+        }
+
+    def get_performance_report(self):
+        """生成报告"""
+        stats = self.get_performance_stats()
+
+        if stats is None:
+            return "No trades executed"
+
+        annualized_return = stats['annualized_return']
+        total_return = stats['total_return']
+        max_drawdown = stats['max_drawdown']
+        win_rate = stats['win_rate']
+        avg_win = stats['avg_win']
+        avg_loss = stats['avg_loss']
+        profit_factor = stats['profit_factor']
+        trade_count = stats['trade_count']
+        long_ratio = stats['long_ratio']
+        avg_duration = stats['avg_duration']
+
         # report = f"""
         # ========== 策略绩效报告 ==========
         # 年化收益率: {annualized_return:.2%}
@@ -195,9 +287,9 @@ class EnhancedRSIStrategyBacktest:
         # 平均盈利: {avg_win:.2%}
         # 平均亏损: {avg_loss:.2%}
         # 盈亏比: {profit_factor:.2f}
-        # 总交易次数: {len(trades_df)}
-        # 多头交易占比: {trades_df[trades_df['direction']==1].shape[0]/len(trades_df):.1%}
-        # 平均持仓时间: {trades_df['duration'].mean():.2f}小时
+        # 总交易次数: {trade_count}
+        # 多头交易占比: {long_ratio:.1%}
+        # 平均持仓时间: {avg_duration:.2f}小时
         # """
 
         report = f"""
@@ -243,7 +335,7 @@ class EnhancedRSIStrategyBacktest:
                 <div style="flex: 1; padding: 15px; background: rgba(var(--block-background-fill), 0.5); border-radius: 6px;">
                     <h3 style="color: var(--neutral-color); margin: 0 0 10px 0;">交易</h3>
                     <table style="width: 100%; color: var(--body-text-color);">
-                        <tr><td>总次数</td><td style="text-align: right;">{len(trades_df)}</td></tr>
+                        <tr><td>总次数</td><td style="text-align: right;">{trade_count}</td></tr>
                         <tr><td>胜率</td><td style="text-align: right;">{win_rate:.2%}</td></tr>
                     </table>
                 </div>
@@ -267,10 +359,10 @@ class EnhancedRSIStrategyBacktest:
                     </div>
                     <div style="flex: 1;">
                         <p style="margin: 5px 0;">
-                            多头占比 <span style="float: right;">{trades_df[trades_df['direction']==1].shape[0]/len(trades_df):.1%}</span>
+                            多头占比 <span style="float: right;">{long_ratio:.1%}</span>
                         </p>
                         <p style="margin: 5px 0;">
-                            持仓时长 <span style="float: right;">{trades_df['duration'].mean():.1f}h</span>
+                            持仓时长 <span style="float: right;">{avg_duration:.1f}h</span>
                         </p>
                     </div>
                 </div>
@@ -281,6 +373,9 @@ class EnhancedRSIStrategyBacktest:
 
 
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    from sqlalchemy import create_engine
+
     # 创建数据库连接
     db_engine = create_engine('sqlite:///db/financial_data.db')
     
@@ -305,7 +400,8 @@ if __name__ == "__main__":
         
         # 输出结果
         print(backtester.get_performance_report())
-        backtester.plot_results()
+        _setup_plotting()
+        backtester.plot_results(plt.figure(figsize=(16, 12)))
         plt.show()
 
     except Exception as e:
@@ -0,0 +1,46 @@
+"""导入耗时预算：回测工作进程与批量任务不应加载绘图库和 Gradio"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 单个模块的导入耗时上限（秒），不含解释器启动；较慢的机器可通过环境变量放宽
+IMPORT_BUDGET = float(os.environ.get('IMPORT_BUDGET_SECONDS', 3.0))
+
+HEAVY_MODULES = ['matplotlib', 'seaborn', 'gradio']
+
+PROBE = """
+import json, sys, time
+begin = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - begin
+print(json.dumps({{'elapsed': elapsed, 'modules': sorted(sys.modules)}}))
+"""
+
+
+def _import_in_subprocess(module):
+    """在全新解释器中导入 module，返回 (耗时, 已加载模块集合)"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module)],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120, check=True
+    )
+    # app 导入时会打印数据库路径，结果在最后一行
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    return probe['elapsed'], set(probe['modules'])
+
+
+@pytest.mark.parametrize('module, forbidden', [
+    ('strategy.Strategy', HEAVY_MODULES + ['sqlalchemy']),
+    ('app', HEAVY_MODULES),
+])
+def test_import_is_lazy_and_within_budget(module, forbidden):
+    elapsed, modules = _import_in_subprocess(module)
+    loaded = [name for name in forbidden if name in modules]
+    assert not loaded, f"导入 {module} 时加载了 {loaded}"
+    assert elapsed < IMPORT_BUDGET, f"导入 {module} 耗时 {elapsed:.2f}s，超过预算 {IMPORT_BUDGET}s"